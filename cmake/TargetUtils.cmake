@@ -97,14 +97,22 @@ endfunction()
     helios_target_set_optimization(<target>)
 
     Applies configuration-specific optimization and debug compile options.
+    On MSVC, debug info uses HELIOS_MSVC_DEBUG_INFO_FLAG (default /Zi; /Z7
+    when a compiler cache is in use, see CompilerCache.cmake).
 ]]
 function(helios_target_set_optimization TARGET)
+  if(HELIOS_MSVC_DEBUG_INFO_FLAG)
+    set(_debug_info ${HELIOS_MSVC_DEBUG_INFO_FLAG})
+  else()
+    set(_debug_info /Zi)
+  endif()
+
   target_compile_options(${TARGET} PRIVATE
       # MSVC and clang-cl (MSVC frontend)
       $<$<OR:$<CXX_COMPILER_ID:MSVC>,$<AND:$<CXX_COMPILER_ID:Clang>,$<PLATFORM_ID:Windows>>>:
           /Zc:preprocessor
-          $<$<CONFIG:Debug>:/Od /Zi /RTC1>
-          $<$<CONFIG:RelWithDebInfo>:/O2 /Zi /DNDEBUG>
+          $<$<CONFIG:Debug>:/Od ${_debug_info} /RTC1>
+          $<$<CONFIG:RelWithDebInfo>:/O2 ${_debug_info} /DNDEBUG>
           $<$<CONFIG:Release>:/O2 /Ob2 /DNDEBUG>
       >
       # GCC and Clang on Unix-like systems
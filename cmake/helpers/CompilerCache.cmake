@@ -0,0 +1,52 @@
+# Helios Engine compiler cache setup
+#
+# Detects sccache or ccache and installs it as the compiler launcher so
+# unchanged translation units are served from the cache on rebuilds.
+
+include_guard(GLOBAL)
+
+#[[
+    helios_configure_compiler_cache()
+
+    Sets CMAKE_C_COMPILER_LAUNCHER and CMAKE_CXX_COMPILER_LAUNCHER to the first
+    of sccache or ccache found in PATH. Does nothing when
+    HELIOS_USE_COMPILER_CACHE is OFF, when the HELIOS_NO_COMPILER_CACHE
+    environment variable is set, or when a launcher was already passed on the
+    command line. Visual Studio generators ignore compiler launchers.
+
+    With a launcher active on MSVC or clang-cl, debug information is embedded
+    in the object files (/Z7, CMAKE_MSVC_DEBUG_INFORMATION_FORMAT=Embedded)
+    because compiles that write a shared PDB (/Zi) cannot be cached.
+    HELIOS_MSVC_DEBUG_INFO_FLAG carries the choice to
+    helios_target_set_optimization().
+
+    Example:
+        include(CompilerCache)
+        helios_configure_compiler_cache()
+]]
+function(helios_configure_compiler_cache)
+  if(NOT HELIOS_USE_COMPILER_CACHE OR DEFINED ENV{HELIOS_NO_COMPILER_CACHE})
+    return()
+  endif()
+
+  if(CMAKE_CXX_COMPILER_LAUNCHER)
+    message(STATUS "Compiler cache: using provided launcher ${CMAKE_CXX_COMPILER_LAUNCHER}")
+  else()
+    find_program(HELIOS_COMPILER_CACHE_EXECUTABLE NAMES sccache ccache)
+    if(NOT HELIOS_COMPILER_CACHE_EXECUTABLE)
+      return()
+    endif()
+
+    set(CMAKE_C_COMPILER_LAUNCHER "${HELIOS_COMPILER_CACHE_EXECUTABLE}" PARENT_SCOPE)
+    set(CMAKE_CXX_COMPILER_LAUNCHER "${HELIOS_COMPILER_CACHE_EXECUTABLE}" PARENT_SCOPE)
+    message(STATUS "Compiler cache: ${HELIOS_COMPILER_CACHE_EXECUTABLE}")
+  endif()
+
+  # sccache/ccache cannot cache MSVC compiles that write a shared PDB (/Zi),
+  # so embed the debug info in each object file (/Z7) instead
+  if(MSVC)
+    set(CMAKE_MSVC_DEBUG_INFORMATION_FORMAT
+        "$<$<CONFIG:Debug,RelWithDebInfo>:Embedded>" PARENT_SCOPE)
+    set(HELIOS_MSVC_DEBUG_INFO_FLAG /Z7 PARENT_SCOPE)
+  endif()
+endfunction()
@@ -8,21 +8,61 @@ directly. Version comes from project(VERSION ...) in CMakeLists.txt.
 """
 
 import argparse
+import fnmatch
+import functools
+import hashlib
+import mmap
 import os
 import re
 import shutil
 import subprocess
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 from edition_selector import (
+    PROJECT_VERSION_RE,
     render_branch_selector_html,
     render_version_selector_html,
     write_selector_js,
 )
+from source_tools import PROBE_TIMEOUT
+
+# Paths relative to the repository root
+DOXYGEN_SUBDIR = Path("docs", "doxygen")
+DOXYFILE_TEMPLATE = DOXYGEN_SUBDIR / "Doxyfile.in"
+HTML_OUTPUT_SUBDIR = DOXYGEN_SUBDIR / "html"
+STANDALONE_BUILD_SUBDIR = Path("build", "docs-doxygen")
+
+# @VAR@ placeholders, as substituted by CMake's configure_file(... @ONLY)
+CONFIGURE_VAR_RE = re.compile(r"@[A-Za-z_][A-Za-z0-9_]*@")
+
+# Marker Doxygen prints once per diagnostic
+WARNING_RE = re.compile(r"warning:", re.IGNORECASE)
+
+# Output lines kept for the error report when a quiet build fails
+OUTPUT_TAIL_LINES = 50
+
+# Written next to the generated HTML; fingerprints the inputs of the last build
+DOXYGEN_STAMP_FILE = ".helios_doxy_hash"
+
+# Doxyfile tags naming extra files or directories that shape the output
+DOXYGEN_ASSET_TAGS = (
+    "PROJECT_LOGO",
+    "PROJECT_ICON",
+    "IMAGE_PATH",
+    "HTML_HEADER",
+    "HTML_FOOTER",
+    "HTML_EXTRA_STYLESHEET",
+    "HTML_EXTRA_FILES",
+)
+
+# CMakeCache.txt entry written by option(HELIOS_BUILD_DOCS ...) when enabled
+DOCS_ENABLED_RE = re.compile(rb"^HELIOS_BUILD_DOCS:BOOL=ON[ \t\r]*$", re.MULTILINE)
 
 
 class Colors:
@@ -87,6 +127,7 @@ def print_info(message: str) -> None:
     print(f"{Colors.BLUE}{message}{Colors.NC}")
 
 
+@functools.lru_cache(maxsize=None)
 def find_executable(name: str) -> Optional[Path]:
     """Find an executable in PATH"""
 
@@ -100,6 +141,13 @@ def check_dependencies(root_dir: Path) -> Tuple[bool, list, list]:
     missing = []
     warnings = []
 
+    # Overlap the PATH walks and the version subprocess; results are memoized,
+    # so the checks below and the later version lookup just read the cache
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        executor.submit(find_executable, "doxygen")
+        executor.submit(find_executable, "dot")
+        executor.submit(get_doxygen_version)
+
     if not find_executable("doxygen"):
         missing.append("doxygen")
 
@@ -116,12 +164,17 @@ def check_dependencies(root_dir: Path) -> Tuple[bool, list, list]:
     return len(missing) == 0, missing, warnings
 
 
+@functools.lru_cache(maxsize=None)
 def get_doxygen_version() -> Optional[str]:
     """Get Doxygen version"""
 
     try:
         result = subprocess.run(
-            ["doxygen", "--version"], capture_output=True, text=True, check=True
+            ["doxygen", "--version"],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=PROBE_TIMEOUT,
         )
         return result.stdout.strip()
     except Exception:
@@ -146,19 +199,16 @@ def is_doxygen_version_supported(version: str, minimum: str = "1.17.0") -> bool:
 def count_warnings(output: str) -> int:
     """Count warnings in Doxygen output"""
 
-    return output.lower().count("warning:")
+    return sum(1 for _ in WARNING_RE.finditer(output))
 
 
+@functools.lru_cache(maxsize=None)
 def read_project_version(root_dir: Path) -> str:
-    """Read project VERSION from the root CMakeLists.txt."""
+    """Read project VERSION from the root CMakeLists.txt (cached per root)."""
 
     cmake_file = root_dir / "CMakeLists.txt"
     text = cmake_file.read_text(encoding="utf-8")
-    match = re.search(
-        r"project\s*\(\s*HeliosEngine\s+VERSION\s+([\d.]+)",
-        text,
-        re.IGNORECASE | re.DOTALL,
-    )
+    match = PROJECT_VERSION_RE.search(text)
     if not match:
         print_warning(f"Could not parse VERSION from {cmake_file}; using 0.0.0")
         return "0.0.0"
@@ -210,32 +260,121 @@ def cmake_path(path: Path) -> str:
     return str(path.resolve()).replace("\\", "/")
 
 
+def write_if_changed(path: Path, text: str) -> bool:
+    """Write text to path unless the file already holds it (keeps mtime stable)."""
+
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    path.write_text(text, encoding="utf-8")
+    return True
+
+
 def configure_doxyfile(root_dir: Path, build_doxygen_dir: Path) -> Path:
     """Materialize Doxyfile.in into the build tree."""
 
-    template = root_dir / "docs/doxygen/Doxyfile.in"
+    template = root_dir / DOXYFILE_TEMPLATE
     if not template.exists():
         raise FileNotFoundError(f"Doxyfile template not found: {template}")
 
     project_number = resolve_project_number(root_dir)
-    text = template.read_text(encoding="utf-8")
-    text = text.replace("@HELIOS_SOURCE_DIR@", cmake_path(root_dir))
-    text = text.replace(
-        "@HELIOS_DOXYGEN_OUTPUT_DIR@", cmake_path(root_dir / "docs/doxygen")
+    substitutions = {
+        "@HELIOS_SOURCE_DIR@": cmake_path(root_dir),
+        "@HELIOS_DOXYGEN_OUTPUT_DIR@": cmake_path(root_dir / DOXYGEN_SUBDIR),
+        "@HELIOS_DOXYGEN_PROJECT_NUMBER@": project_number,
+    }
+    text = CONFIGURE_VAR_RE.sub(
+        lambda match: substitutions.get(match.group(0), match.group(0)),
+        template.read_text(encoding="utf-8"),
     )
-    text = text.replace("@HELIOS_DOXYGEN_PROJECT_NUMBER@", project_number)
 
     build_doxygen_dir.mkdir(parents=True, exist_ok=True)
     doxyfile = build_doxygen_dir / "Doxyfile"
-    doxyfile.write_text(text, encoding="utf-8")
+    write_if_changed(doxyfile, text)
     print_info(f"Project version: {project_number}")
     return doxyfile
 
 
+def parse_doxyfile(text: str) -> Dict[str, List[str]]:
+    """Parse Doxyfile tags into value lists, joining continued lines."""
+
+    tags: Dict[str, List[str]] = {}
+    for line in text.replace("\\\n", " ").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, _, value = line.partition("=")
+        append = key.endswith("+")
+        key = key.rstrip("+").strip()
+        values = [item.strip('"') for item in value.split()]
+        tags[key] = tags.get(key, []) + values if append else values
+    return tags
+
+
+def doxygen_input_fingerprint(doxyfile: Path) -> str:
+    """
+    Hash a Doxyfile together with the size and mtime of every file it reads
+
+    Args:
+        doxyfile: Configured Doxyfile to fingerprint
+
+    Returns:
+        Hex digest that changes whenever Doxygen would produce different output
+    """
+
+    text = doxyfile.read_text(encoding="utf-8")
+    tags = parse_doxyfile(text)
+    patterns = tags.get("FILE_PATTERNS") or ["*"]
+    excludes = tags.get("EXCLUDE_PATTERNS", [])
+    recursive = tags.get("RECURSIVE", ["NO"])[0].upper() == "YES"
+
+    def wanted(path: str) -> bool:
+        name = os.path.basename(path)
+        posix_path = path.replace(os.sep, "/")
+        return any(fnmatch.fnmatch(name, p) for p in patterns) and not any(
+            fnmatch.fnmatch(posix_path, p) for p in excludes
+        )
+
+    files = []
+    for entry in tags.get("INPUT", []):
+        if os.path.isdir(entry):
+            for root, dirs, names in os.walk(entry):
+                if not recursive:
+                    dirs[:] = []
+                files.extend(
+                    path
+                    for path in (os.path.join(root, name) for name in names)
+                    if wanted(path)
+                )
+        else:
+            files.append(entry)
+
+    for tag in DOXYGEN_ASSET_TAGS:
+        for entry in tags.get(tag, []):
+            if os.path.isdir(entry):
+                for root, _, names in os.walk(entry):
+                    files.extend(os.path.join(root, name) for name in names)
+            else:
+                files.append(entry)
+
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(text.encode("utf-8"))
+    hasher.update((get_doxygen_version() or "").encode("utf-8"))
+    for path in sorted(set(files)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        hasher.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return hasher.hexdigest()
+
+
 def html_output_dir(root_dir: Path) -> Path:
     """Return the generated HTML output directory."""
 
-    return root_dir / "docs/doxygen/html"
+    return root_dir / HTML_OUTPUT_SUBDIR
 
 
 def write_local_edition_selector(output_dir: Path, root_dir: Path) -> None:
@@ -275,87 +414,135 @@ def post_process_docs(root_dir: Path) -> None:
     write_local_edition_selector(output_dir, root_dir)
 
 
+def cmake_cache_enables_docs(cache: str) -> bool:
+    """Return True when a CMakeCache.txt has HELIOS_BUILD_DOCS switched on."""
+
+    with open(cache, "rb") as file:
+        try:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return DOCS_ENABLED_RE.search(data) is not None
+        except ValueError:  # Empty files cannot be mapped
+            return False
+
+
 def find_cmake_build_dir(root_dir: Path) -> Optional[Path]:
     """Find a configured build directory with HELIOS_BUILD_DOCS enabled."""
 
     build_root = root_dir / "build"
-    if not build_root.is_dir():
+    configured = []
+    try:
+        # DirEntry reuses readdir() type info instead of one stat per is_dir()
+        with os.scandir(build_root) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                # Plain strings in the loop; Path is only built for the result
+                cache = os.path.join(entry.path, "CMakeCache.txt")
+                # One stat both proves the cache exists and orders candidates
+                try:
+                    mtime = os.stat(cache).st_mtime
+                except FileNotFoundError:
+                    continue
+                configured.append((mtime, cache))
+    except (FileNotFoundError, NotADirectoryError):
         return None
 
-    candidates = sorted(
-        (path for path in build_root.iterdir() if path.is_dir()),
-        key=lambda path: path.stat().st_mtime,
-        reverse=True,
-    )
-    for candidate in candidates:
-        cache = candidate / "CMakeCache.txt"
-        if not cache.exists():
-            continue
-        cache_text = cache.read_text(encoding="utf-8", errors="ignore")
-        if "HELIOS_BUILD_DOCS:BOOL=ON" in cache_text:
-            return candidate
+    configured.sort(key=lambda item: item[0], reverse=True)
+    for _, cache in configured:
+        if cmake_cache_enables_docs(cache):
+            return Path(cache).parent
     return None
 
 
+def run_streaming(
+    command: List[str], quiet: bool, cwd: Optional[Path] = None
+) -> Tuple[int, int, List[str]]:
+    """
+    Run a build command, echoing and scanning its output as it arrives
+
+    Args:
+        command: Command line to execute
+        quiet: If True, don't echo the output
+        cwd: Working directory for the command
+
+    Returns:
+        Tuple of (return code, warning count, last lines of output)
+    """
+
+    warning_count = 0
+    tail: deque = deque(maxlen=OUTPUT_TAIL_LINES)
+    with subprocess.Popen(
+        command,
+        cwd=str(cwd) if cwd else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+        bufsize=1,
+    ) as process:
+        for line in process.stdout:
+            warning_count += count_warnings(line)
+            tail.append(line)
+            if not quiet:
+                sys.stdout.write(line)
+        returncode = process.wait()
+
+    return returncode, warning_count, list(tail)
+
+
 def build_docs_with_cmake(build_dir: Path, quiet: bool) -> Tuple[bool, int]:
     """Build documentation through the helios_docs CMake target."""
 
     print_info(f"Building documentation via CMake: {build_dir}")
     command = ["cmake", "--build", str(build_dir), "--target", "helios_docs"]
 
-    result = subprocess.run(command, capture_output=True, text=True, check=False)
-    if not quiet:
-        if result.stdout:
-            print(result.stdout)
-        if result.stderr:
-            print(result.stderr, file=sys.stderr)
-
-    output = (result.stdout or "") + (result.stderr or "")
-    warning_count = count_warnings(output)
-    return result.returncode == 0, warning_count
+    returncode, warning_count, _ = run_streaming(command, quiet)
+    return returncode == 0, warning_count
 
 
-def build_docs_standalone(root_dir: Path, quiet: bool) -> bool:
+def build_docs_standalone(root_dir: Path, quiet: bool, force: bool = False) -> bool:
     """Configure Doxyfile.in in the build tree and run Doxygen directly."""
 
-    build_doxygen_dir = root_dir / "build/docs-doxygen"
+    build_doxygen_dir = root_dir / STANDALONE_BUILD_SUBDIR
     output_dir = html_output_dir(root_dir)
+    stamp_file = output_dir / DOXYGEN_STAMP_FILE
 
     try:
-        configure_doxyfile(root_dir, build_doxygen_dir)
+        doxyfile = configure_doxyfile(root_dir, build_doxygen_dir)
     except FileNotFoundError as error:
         print_error(str(error))
         return False
 
+    fingerprint = doxygen_input_fingerprint(doxyfile)
+    if not force and (output_dir / "index.html").exists():
+        try:
+            up_to_date = stamp_file.read_text(encoding="utf-8").strip() == fingerprint
+        except OSError:
+            up_to_date = False
+        if up_to_date:
+            print_info("Documentation inputs unchanged, skipping Doxygen (use --force)")
+            post_process_docs(root_dir)
+            print_success(f"Documentation is up to date: {output_dir / 'index.html'}")
+            return True
+
     print_info(f"Building documentation from: {build_doxygen_dir / 'Doxyfile'}")
     print_info(f"Output directory: {output_dir}")
     print()
 
     try:
-        result = subprocess.run(
-            ["doxygen", "Doxyfile"],
-            cwd=str(build_doxygen_dir),
-            capture_output=True,
-            text=True,
-            check=False,
+        returncode, warning_count, tail = run_streaming(
+            ["doxygen", "Doxyfile"], quiet, cwd=build_doxygen_dir
         )
 
-        if not quiet:
-            if result.stdout:
-                print(result.stdout)
-            if result.stderr:
-                print(result.stderr, file=sys.stderr)
-
-        if result.returncode != 0:
+        if returncode != 0:
             print_error("Doxygen build failed!")
-            if result.stderr and quiet:
-                print(result.stderr, file=sys.stderr)
+            if quiet and tail:
+                print("".join(tail), end="", file=sys.stderr)
             return False
 
         post_process_docs(root_dir)
+        write_if_changed(stamp_file, fingerprint + "\n")
 
-        output = (result.stdout or "") + (result.stderr or "")
-        warning_count = count_warnings(output)
         print_build_success(output_dir, warning_count, quiet)
         return True
 
@@ -413,6 +600,7 @@ def build_docs(
     quiet: bool = False,
     use_cmake: bool = False,
     build_dir: Optional[Path] = None,
+    force: bool = False,
 ) -> bool:
     """Build documentation using CMake when configured, otherwise standalone."""
 
@@ -446,7 +634,7 @@ def build_docs(
         print_build_success(output_dir, warning_count, quiet)
         return True
 
-    return build_docs_standalone(root_dir, quiet)
+    return build_docs_standalone(root_dir, quiet, force)
 
 
 def main() -> int:
@@ -504,6 +692,11 @@ Examples:
         type=Path,
         help="CMake build directory for the helios_docs target",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if the documentation inputs are unchanged",
+    )
     parser.add_argument(
         "--docs-dir", type=Path, help="Path to docs directory (default: auto-detect)"
     )
@@ -574,6 +767,7 @@ Examples:
         quiet=quiet,
         use_cmake=args.cmake,
         build_dir=args.build_dir.resolve() if args.build_dir else None,
+        force=args.force,
     )
     return 0 if success else 1
 
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import functools
 import html
 import json
 import os
@@ -10,16 +11,16 @@ from pathlib import Path
 from typing import Optional, Sequence, Tuple
 
 SEMVER_DIR = re.compile(r"^\d+\.\d+\.\d+(?:[-+][0-9A-Za-z.-]+)?$")
+PROJECT_VERSION_RE = re.compile(
+    r"project\s*\(\s*HeliosEngine\s+VERSION\s+([\d.]+)", re.IGNORECASE | re.DOTALL
+)
 
 
+@functools.lru_cache(maxsize=None)
 def read_project_version(repo_root: Path) -> str:
     cmake_file = repo_root / "CMakeLists.txt"
     text = cmake_file.read_text(encoding="utf-8")
-    match = re.search(
-        r"project\s*\(\s*HeliosEngine\s+VERSION\s+([\d.]+)",
-        text,
-        re.IGNORECASE | re.DOTALL,
-    )
+    match = PROJECT_VERSION_RE.search(text)
     return match.group(1) if match else "0.0.0"
 
 
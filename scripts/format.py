@@ -6,10 +6,43 @@ This script formats C++ source code using clang-format.
 """
 
 import argparse
+import functools
+import hashlib
+import os
+import re
 import subprocess
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Sequence, Set
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from source_tools import (
+    PROBE_TIMEOUT,
+    SOURCE_EXTENSIONS,
+    get_job_count,
+    get_tool_version,
+    is_excluded,
+    load_cache,
+    make_batches,
+    make_exclude_prefixes,
+    save_cache,
+    scan_source_dir,
+)
+
+# Upper bound on files handed to one clang-format process
+MAX_BATCH_SIZE = 32
+
+# Known-formatted file hashes, relative to the project root
+FORMAT_CACHE_FILE = Path(".cache", "format", "index.json")
+
+# Diagnostic emitted per offending file by --dry-run --Werror
+VIOLATION_RE = re.compile(
+    r"^(.+?):\d+:\d+: (?:error|warning): .*\[-Wclang-format-violations\]",
+    re.MULTILINE,
+)
 
 
 class Colors:
@@ -70,46 +103,112 @@ def print_error(msg: str) -> None:
 def check_clang_format() -> bool:
     """Check if clang-format is installed"""
 
+    return get_tool_version("clang-format") is not None
+
+
+def file_digest(file_path: Path) -> str:
+    """Hash file contents for the format cache"""
+
+    return hashlib.blake2b(file_path.read_bytes(), digest_size=16).hexdigest()
+
+
+def make_cache_entry(file_path: Path) -> dict:
+    """Record a file's current contents for the format cache"""
+
+    stat = file_path.stat()
+    return {
+        "hash": file_digest(file_path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+
+
+def is_cache_hit(file_path: Path, entry: dict) -> bool:
+    """
+    Check if a file still matches its cache entry
+
+    Unchanged mtime and size are trusted without reading the file. Otherwise
+    the contents are hashed, and a matching hash refreshes the entry's stat
+    fields so the next run takes the fast path again.
+    """
+
+    if not entry:
+        return False
+
+    stat = file_path.stat()
+    if entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+        return True
+
+    if entry.get("hash") != file_digest(file_path):
+        return False
+
+    entry["mtime_ns"] = stat.st_mtime_ns
+    entry["size"] = stat.st_size
+    return True
+
+
+def format_cache_fingerprint(project_root: Path) -> str:
+    """Identify the clang-format build and style a cached result was produced with"""
+
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update((get_tool_version("clang-format") or "").encode("utf-8"))
+    style_file = project_root / ".clang-format"
+    if style_file.is_file():
+        hasher.update(style_file.read_bytes())
+    return hasher.hexdigest()
+
+
+def save_format_cache(
+    cache_file: Path, fingerprint: str, files: Dict[str, dict]
+) -> None:
+    """Write cache entries back to disk, warning instead of failing"""
+
     try:
-        subprocess.run(
-            ["clang-format", "--version"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+        save_cache(cache_file, fingerprint, files)
+    except OSError as e:
+        print_warning(f"Could not write format cache {cache_file}: {e}")
+
+
+@functools.lru_cache(maxsize=None)
+def supports_files_option() -> bool:
+    """Check if clang-format can read its file list from a file (--files)"""
+
+    try:
+        result = subprocess.run(
+            ["clang-format", "--help"],
+            capture_output=True,
+            text=True,
             check=True,
+            timeout=PROBE_TIMEOUT,
         )
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
+        return "--files=" in result.stdout
+    except (
+        subprocess.CalledProcessError,
+        subprocess.TimeoutExpired,
+        FileNotFoundError,
+    ):
         return False
 
 
 def find_source_files(
-    source_dirs: List[Path], extensions: List[str], exclude_dirs: List[str]
+    source_dirs: List[Path], extensions: Sequence[str], exclude_dirs: List[Path]
 ) -> List[Path]:
     """Find all source files in the given directories"""
 
     source_files = []
+    suffixes = tuple(f".{ext}" for ext in extensions)
+    exclude_prefixes = make_exclude_prefixes(exclude_dirs)
 
     for source_dir in source_dirs:
         if not source_dir.exists():
             print_warning(f"Directory does not exist: {source_dir}")
             continue
 
-        print_info(f"Scanning directory: {source_dir}")
+        if is_excluded(str(source_dir), exclude_prefixes):
+            continue
 
-        for ext in extensions:
-            for file_path in source_dir.rglob(f"*.{ext}"):
-                # Check if file is in an excluded directory
-                excluded = False
-                for exclude_dir in exclude_dirs:
-                    try:
-                        file_path.relative_to(exclude_dir)
-                        excluded = True
-                        break
-                    except ValueError:
-                        pass
-
-                if not excluded:
-                    source_files.append(file_path)
+        print_info(f"Scanning directory: {source_dir}")
+        source_files.extend(scan_source_dir(source_dir, suffixes, exclude_prefixes))
 
     return sorted(source_files)
 
@@ -154,6 +253,60 @@ def format_file(file_path: Path, check_only: bool = False) -> bool:
         return False
 
 
+def format_files(file_paths: List[Path], check_only: bool = False) -> List[Path]:
+    """
+    Format a batch of files with a single clang-format process
+
+    Args:
+        file_paths: Paths to the files to format
+        check_only: If True, only check formatting without modifying
+
+    Returns:
+        Files that are not correctly formatted (or failed to format)
+    """
+
+    mode = ["--dry-run", "--Werror"] if check_only else ["-i"]
+    command = ["clang-format", "-style=file", *mode]
+    list_file = None
+
+    if supports_files_option():
+        # Hand the paths over in a list file instead of argv to stay clear of
+        # command line length limits (notably on Windows)
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".txt", delete=False, encoding="utf-8"
+        ) as f:
+            f.write("\n".join(map(str, file_paths)))
+            list_file = f.name
+        command.append(f"--files={list_file}")
+    else:
+        command.extend(map(str, file_paths))
+
+    try:
+        result = subprocess.run(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+    finally:
+        if list_file:
+            os.unlink(list_file)
+
+    if result.returncode == 0:
+        return []
+
+    if check_only:
+        flagged = set(VIOLATION_RE.findall(result.stderr))
+        offending = [path for path in file_paths if str(path) in flagged]
+        if offending:
+            return offending
+
+    # Failure could not be attributed to specific files; retry one by one
+    if len(file_paths) == 1:
+        return list(file_paths)
+    return [path for path in file_paths if not format_file(path, check_only)]
+
+
 def main() -> int:
     """Main entry point"""
 
@@ -165,6 +318,18 @@ def main() -> int:
         action="store_true",
         help="Check formatting only (don't modify files)",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=get_job_count(),
+        help="Number of parallel clang-format processes (default: available CPUs)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore and don't update the cache of already formatted files",
+    )
     parser.add_argument(
         "paths",
         nargs="*",
@@ -185,11 +350,12 @@ def main() -> int:
         print_error("clang-format is not installed. Please install it first.")
         return 1
 
-    # Define file extensions to process
-    extensions = ["cpp", "h", "hpp", "inl"]
+    extensions = SOURCE_EXTENSIONS
+    suffixes = tuple(f".{ext}" for ext in extensions)
 
     # Define directories to exclude
     exclude_dirs = [project_root / "third-party"]
+    exclude_prefixes = make_exclude_prefixes(exclude_dirs)
 
     # Find source files
     print_info("Finding source files...")
@@ -197,6 +363,7 @@ def main() -> int:
     if args.paths:
         # Process specific paths provided by user
         source_files = []
+        source_dirs = []
         for path_str in args.paths:
             path = Path(path_str)
 
@@ -210,30 +377,27 @@ def main() -> int:
 
             if path.is_file():
                 # Check if it's a valid source file
-                if path.suffix[1:] in extensions:
+                if path.name.endswith(suffixes):
                     # Check if it's not in excluded directories
-                    excluded = False
-                    for exclude_dir in exclude_dirs:
-                        try:
-                            path.relative_to(exclude_dir)
-                            excluded = True
-                            break
-                        except ValueError:
-                            pass
-
-                    if not excluded:
+                    if not is_excluded(str(path), exclude_prefixes):
                         source_files.append(path)
                     else:
                         print_warning(f"Skipping excluded file: {path}")
                 else:
                     print_warning(f"Skipping non-source file: {path}")
             elif path.is_dir():
-                # Recursively find source files in directory
-                source_files.extend(find_source_files([path], extensions, exclude_dirs))
+                # Excluded trees are dropped whole, never walked
+                if is_excluded(str(path), exclude_prefixes):
+                    print_warning(f"Skipping excluded directory: {path}")
+                else:
+                    source_dirs.append(path)
             else:
                 print_warning(f"Unknown path type: {path}")
 
-        source_files = sorted(set(source_files))
+        # Walk all requested directories in one pass over the exclude prefixes
+        source_files.extend(find_source_files(source_dirs, extensions, exclude_dirs))
+        # Explicit files keep their command line order, walked files follow sorted
+        source_files = list(dict.fromkeys(source_files))
     else:
         # Default: process all source directories
         source_dirs = [
@@ -251,15 +415,49 @@ def main() -> int:
 
     print_info(f"Found {len(source_files)} source files to process.")
 
-    # Process files
+    # Skip files whose exact contents were already seen correctly formatted
+    use_cache = not args.no_cache
+    cache_file = project_root / FORMAT_CACHE_FILE
+    cache = {}
+    pending = source_files
+    if use_cache:
+        fingerprint = format_cache_fingerprint(project_root)
+        cache = load_cache(cache_file, fingerprint)
+        pending = [
+            file_path
+            for file_path in source_files
+            if not is_cache_hit(file_path, cache.get(str(file_path), {}))
+        ]
+    if len(pending) < len(source_files):
+        print_info(
+            f"Skipping {len(source_files) - len(pending)} file(s) unchanged since "
+            "they were last formatted."
+        )
+
+    # Process files in batches; each worker thread just waits on clang-format
+    batches = make_batches(pending, args.jobs, MAX_BATCH_SIZE)
+
+    def run_batches(check_only: bool) -> Set[Path]:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            results = executor.map(
+                lambda batch: format_files(batch, check_only=check_only), batches
+            )
+            return {path for offending in results for path in offending}
+
     if args.check:
         print_info("Checking format only (not modifying files)...")
         needs_formatting = []
 
-        for file_path in source_files:
-            if not format_file(file_path, check_only=True):
+        offending = run_batches(check_only=True)
+        for file_path in pending:
+            if file_path in offending:
                 print_warning(f"File needs formatting: {file_path}")
                 needs_formatting.append(file_path)
+            elif use_cache:
+                cache[str(file_path)] = make_cache_entry(file_path)
+
+        if use_cache:
+            save_format_cache(cache_file, fingerprint, cache)
 
         if not needs_formatting:
             print_success("All files are correctly formatted.")
@@ -274,11 +472,18 @@ def main() -> int:
         print_info("Formatting files...")
         failed_files = []
 
-        for file_path in source_files:
+        offending = run_batches(check_only=False)
+        for file_path in pending:
             print_info(f"Formatting: {file_path}")
-            if not format_file(file_path, check_only=False):
+            if file_path in offending:
                 print_error(f"Failed to format: {file_path}")
                 failed_files.append(file_path)
+            elif use_cache:
+                # Contents may have just changed; record the formatted result
+                cache[str(file_path)] = make_cache_entry(file_path)
+
+        if use_cache:
+            save_format_cache(cache_file, fingerprint, cache)
 
         if not failed_files:
             print_success("All files formatted successfully.")
@@ -6,11 +6,48 @@ This script runs clang-tidy on C++ source code for static analysis.
 """
 
 import argparse
+import hashlib
+import json
 import os
+import re
 import subprocess
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from source_tools import (
+    SOURCE_EXTENSIONS,
+    get_job_count,
+    get_tool_version,
+    is_excluded,
+    load_cache,
+    make_batches,
+    make_exclude_prefixes,
+    save_cache,
+    scan_source_dir,
+)
+
+# Upper bound on files handed to one clang-tidy process
+MAX_BATCH_SIZE = 16
+
+# Printed by clang-tidy for each translation unit that failed to analyze
+FAILED_FILE_RE = re.compile(r"^Error while processing (.+)\.$", re.MULTILINE)
+
+# Results of passing files, relative to the project root
+LINT_CACHE_FILE = Path(".cache", "lint", "index.json")
+
+# Start of a diagnostic: "<file>:<line>:<col>: warning|error: ..."
+DIAGNOSTIC_RE = re.compile(r"^(.+?):\d+:\d+: (?:warning|error): ")
+
+# clang-tidy progress and summary lines, which belong to no single file
+SUMMARY_RE = re.compile(
+    r"^(?:\[\d+/\d+\] Processing file |\d+ (?:warnings?|errors?)\b|Suppressed \d+ "
+    r"warnings|Use -header-filter|Error while processing |Found compiler error)"
+)
 
 
 class Colors:
@@ -33,89 +70,202 @@ class Colors:
         cls.NC = ""
 
 
-# Enable colors on Windows 10+
+# Enable colors on Windows 10+; redirected output gets no ANSI codes at all
 if sys.platform == "win32":
-    try:
-        import ctypes
-
-        kernel32 = ctypes.windll.kernel32
-        kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
-    except Exception:
+    if sys.stdout is None or not sys.stdout.isatty():
         Colors.disable()
+    else:
+        try:
+            import ctypes
+
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
+        except Exception:
+            Colors.disable()
 
 
 def print_info(msg: str) -> None:
     """Print info message in blue"""
 
-    print(f"{Colors.BLUE}{msg}{Colors.NC}")
+    sys.stdout.write(f"{Colors.BLUE}{msg}{Colors.NC}\n")
 
 
 def print_success(msg: str) -> None:
     """Print success message in green"""
 
-    print(f"{Colors.GREEN}{msg}{Colors.NC}")
+    sys.stdout.write(f"{Colors.GREEN}{msg}{Colors.NC}\n")
 
 
 def print_warning(msg: str) -> None:
     """Print warning message in yellow"""
 
-    print(f"{Colors.YELLOW}{msg}{Colors.NC}")
+    sys.stdout.write(f"{Colors.YELLOW}{msg}{Colors.NC}\n")
 
 
 def print_error(msg: str) -> None:
     """Print error message in red"""
 
-    print(f"{Colors.RED}{msg}{Colors.NC}", file=sys.stderr)
+    sys.stderr.write(f"{Colors.RED}{msg}{Colors.NC}\n")
 
 
 def check_clang_tidy() -> bool:
     """Check if clang-tidy is installed"""
 
+    return get_tool_version("clang-tidy") is not None
+
+
+def compile_db_key(path: os.PathLike) -> str:
+    """
+    Normalize a path for compile_commands.json lookups
+
+    CMake records source paths as it was given them, which may go through a
+    symlink or differ in case on Windows, while project paths here are resolved.
+    """
+
+    return os.path.normcase(os.path.realpath(path))
+
+
+def load_compile_commands(build_dir: Path) -> Dict[str, str]:
+    """Map each file in compile_commands.json to its serialized entry"""
+
     try:
-        subprocess.run(
-            ["clang-tidy", "--version"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True,
-        )
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+        with open(build_dir / "compile_commands.json", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    commands = {}
+    for entry in entries:
+        file_path = Path(entry.get("directory", ""), entry.get("file", ""))
+        commands[compile_db_key(file_path)] = json.dumps(entry, sort_keys=True)
+    return commands
+
+
+def lint_cache_fingerprint(
+    project_root: Path, build_dir: Path, headers: List[Path]
+) -> str:
+    """
+    Identify everything besides a file's own contents that affects its result
+
+    Covers the clang-tidy build, .clang-tidy, the build directory, and the size
+    and mtime of every project header, since any of them may be included.
+    """
+
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update((get_tool_version("clang-tidy") or "").encode("utf-8"))
+    config_file = project_root / ".clang-tidy"
+    if config_file.is_file():
+        hasher.update(config_file.read_bytes())
+    hasher.update(str(build_dir).encode("utf-8"))
+    for header in headers:
+        stat = header.stat()
+        hasher.update(f"{header}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def lint_cache_key(file_path: Path, command: str) -> str:
+    """Hash a file's contents with its compile command"""
+
+    hasher = hashlib.blake2b(file_path.read_bytes(), digest_size=16)
+    hasher.update(command.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def save_lint_cache(cache_file: Path, fingerprint: str, files: Dict[str, dict]) -> None:
+    """Write cache entries back to disk, warning instead of failing"""
+
+    try:
+        save_cache(cache_file, fingerprint, files)
+    except OSError as e:
+        print_warning(f"Could not write lint cache {cache_file}: {e}")
+
+
+def split_diagnostics(output: str, file_paths: List[Path]) -> Dict[Path, str]:
+    """
+    Split the output of a batched run into per-file diagnostics
+
+    Diagnostic paths may be relative to the compile command's directory, so they
+    are matched against the batch by path suffix. Lines that can't be attributed
+    to a file in the batch are dropped.
+    """
+
+    posix_paths = [(path, "/" + path.as_posix().lstrip("/")) for path in file_paths]
+    by_file: Dict[Path, List[str]] = {path: [] for path in file_paths}
+    owner = None
+
+    for line in output.splitlines(keepends=True):
+        match = DIAGNOSTIC_RE.match(line)
+        if match:
+            diag_path = "/" + Path(match.group(1)).as_posix().lstrip("/")
+            owner = next(
+                (path for path, posix in posix_paths if posix.endswith(diag_path)),
+                None,
+            )
+        elif SUMMARY_RE.match(line):
+            owner = None
+            continue
+
+        if owner is not None:
+            by_file[owner].append(line)
+
+    return {path: "".join(lines) for path, lines in by_file.items()}
 
 
 def find_source_files(
-    source_dirs: List[Path], extensions: List[str], exclude_dirs: List[str]
+    source_dirs: List[Path], extensions: Sequence[str], exclude_dirs: List[Path]
 ) -> List[Path]:
     """Find all source files in the given directories"""
 
-    source_files = []
+    suffixes = tuple(f".{ext}" for ext in extensions)
+    exclude_prefixes = make_exclude_prefixes(exclude_dirs)
+    scan_dirs = []
 
     for source_dir in source_dirs:
         if not source_dir.exists():
             print_warning(f"Directory does not exist: {source_dir}")
             continue
 
+        if is_excluded(str(source_dir), exclude_prefixes):
+            continue
+
         print_info(f"Scanning directory: {source_dir}")
+        scan_dirs.append(source_dir)
 
-        for ext in extensions:
-            for file_path in source_dir.rglob(f"*.{ext}"):
-                # Check if file is in an excluded directory
-                excluded = False
-                for exclude_dir in exclude_dirs:
-                    try:
-                        file_path.relative_to(exclude_dir)
-                        excluded = True
-                        break
-                    except ValueError:
-                        pass
+    if not scan_dirs:
+        return []
+
+    # Directory listing is I/O bound and scandir releases the GIL, so the
+    # trees are walked concurrently
+    with ThreadPoolExecutor(max_workers=len(scan_dirs)) as executor:
+        results = executor.map(
+            lambda source_dir: scan_source_dir(source_dir, suffixes, exclude_prefixes),
+            scan_dirs,
+        )
+        return sorted(path for source_files in results for path in source_files)
 
-                if not excluded:
-                    source_files.append(file_path)
 
-    return sorted(source_files)
+def run_clang_tidy(cmd: List[str]) -> Tuple[int, str]:
+    """
+    Run clang-tidy and capture its combined output
 
+    Args:
+        cmd: clang-tidy command line
 
-def lint_file(file_path: Path, build_dir: Path, fix: bool = False) -> bool:
+    Returns:
+        Tuple of (return code, output)
+    """
+
+    result = subprocess.run(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+    )
+    return result.returncode, result.stdout or ""
+
+
+def lint_file(file_path: Path, build_dir: Path, fix: bool = False) -> Tuple[bool, str]:
     """
     Lint a single file using clang-tidy
 
@@ -125,29 +275,64 @@ def lint_file(file_path: Path, build_dir: Path, fix: bool = False) -> bool:
         fix: If True, automatically fix issues
 
     Returns:
-        True if linting passed, False otherwise
+        Tuple of (True if linting passed, clang-tidy output)
     """
 
-    try:
-        cmd = ["clang-tidy", f"-p={build_dir}", str(file_path)]
-        if fix:
-            cmd.append("--fix")
-
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-        )
+    cmd = ["clang-tidy", f"-p={build_dir}", str(file_path)]
+    if fix:
+        cmd.append("--fix")
+
+    returncode, output = run_clang_tidy(cmd)
+    return returncode == 0, output
+
+
+def lint_files(
+    file_paths: List[Path], build_dir: Path, fix: bool = False
+) -> Tuple[List[Path], str]:
+    """
+    Lint a batch of files with a single clang-tidy process
+
+    With fix, batches are expected to hold a single file: a compiler error in
+    any file of a batch stops clang-tidy from fixing the rest of it.
+
+    Args:
+        file_paths: Paths to the files to lint
+        build_dir: Path to the build directory containing compile_commands.json
+        fix: If True, automatically fix issues
+
+    Returns:
+        Tuple of (files that failed linting, clang-tidy output)
+    """
+
+    if not file_paths:
+        return [], ""
+
+    if len(file_paths) == 1:
+        passed, output = lint_file(file_paths[0], build_dir, fix)
+        return ([] if passed else list(file_paths)), output
 
-        # Print output
-        if result.stdout:
-            print(result.stdout)
+    cmd = ["clang-tidy", f"-p={build_dir}", *map(str, file_paths)]
+    if fix:
+        cmd.append("--fix")
 
-        return result.returncode == 0
-    except subprocess.CalledProcessError as e:
-        print_error(f"Failed to lint {file_path}: {e}")
-        return False
+    returncode, output = run_clang_tidy(cmd)
+    if returncode == 0:
+        return [], output
+
+    # clang-tidy's error count carries over between the files of one run, so
+    # only the first file it reports is known to be bad. Files before it passed;
+    # the ones after it are checked again. The output of this run already holds
+    # every diagnostic, so rechecks stay quiet.
+    positions = {str(path): i for i, path in enumerate(file_paths)}
+    flagged = [positions[f] for f in FAILED_FILE_RE.findall(output) if f in positions]
+    if flagged:
+        first = min(flagged)
+        rest_failed, _ = lint_files(file_paths[first + 1 :], build_dir)
+        return [file_paths[first], *rest_failed], output
+
+    # Failure could not be attributed to specific files; check them one by one
+    failed = [path for path in file_paths if not lint_file(path, build_dir)[0]]
+    return failed, output
 
 
 def find_compile_commands(base_dir: Path) -> Path:
@@ -182,17 +367,48 @@ def find_compile_commands(base_dir: Path) -> Path:
         if (candidate / "compile_commands.json").exists():
             return candidate
 
-    # Try to find it recursively (limit depth to 3 levels)
-    for depth in range(3):
-        pattern = "/".join(["*"] * (depth + 1))
-        for candidate in base_dir.glob(f"{pattern}/compile_commands.json"):
-            return candidate.parent
+    # Search breadth-first (limit depth to 3 levels), stopping at the first hit
+    queue = deque([(str(base_dir), 0)])
+    while queue:
+        directory, depth = queue.popleft()
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name == "compile_commands.json" and depth > 0:
+                        if entry.is_file():
+                            return Path(directory)
+                    # Hidden directories are skipped, as glob("*") would
+                    elif not entry.name.startswith(".") and entry.is_dir():
+                        subdirs.append(entry.path)
+        except OSError:
+            continue
+
+        if depth < 3:
+            queue.extend((subdir, depth + 1) for subdir in sorted(subdirs))
 
     raise FileNotFoundError(
         f"compile_commands.json not found in {base_dir} or its subdirectories"
     )
 
 
+def detect_host_platform() -> str:
+    """Detect the host platform name (linux, macos, windows)"""
+
+    uname = (os.uname().sysname if hasattr(os, "uname") else sys.platform).lower()
+    if uname.startswith("linux"):
+        return "linux"
+    elif uname.startswith("darwin"):
+        return "macos"
+    elif sys.platform.startswith("win"):
+        return "windows"
+    return "unknown"
+
+
+# The host cannot change mid-run, so probe it once at import
+HOST_PLATFORM = detect_host_platform()
+
+
 def detect_platform(platform_arg: str = None) -> str:
     """
     Detect the platform name (linux, macos, windows).
@@ -201,14 +417,7 @@ def detect_platform(platform_arg: str = None) -> str:
 
     if platform_arg:
         return platform_arg.lower()
-    uname = os.uname().sysname if hasattr(os, "uname") else sys.platform
-    if uname.lower().startswith("linux"):
-        return "linux"
-    elif uname.lower().startswith("darwin"):
-        return "macos"
-    elif sys.platform.startswith("win"):
-        return "windows"
-    return "unknown"
+    return HOST_PLATFORM
 
 
 def main() -> int:
@@ -238,6 +447,23 @@ def main() -> int:
         default=None,
         help="Build directory containing compile_commands.json (default: build/<type>/<platform>)",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=get_job_count(),
+        help="Number of parallel clang-tidy processes (default: available CPUs)",
+    )
+    parser.add_argument(
+        "--no-batch",
+        action="store_true",
+        help="Run one clang-tidy process per file (easier to debug)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore and don't update the cache of files that passed linting",
+    )
 
     args = parser.parse_args()
 
@@ -293,8 +519,7 @@ def main() -> int:
         project_root / "examples",
     ]
 
-    # Define file extensions to process (only source files)
-    extensions = ["cpp", "h", "hpp", "inl"]
+    extensions = SOURCE_EXTENSIONS
 
     # Define directories to exclude
     exclude_dirs = [project_root / "third-party"]
@@ -309,6 +534,25 @@ def main() -> int:
         )
         return 0
 
+    # Translation units missing from the compile database aren't part of this
+    # build and would only be analyzed with guessed flags. Headers are kept:
+    # HeaderFilterRegex hides their diagnostics when they're reached via a TU.
+    commands = load_compile_commands(build_dir)
+    if commands:
+        translation_units = [f for f in source_files if f.name.endswith(".cpp")]
+        skipped = {f for f in translation_units if compile_db_key(f) not in commands}
+        if skipped and len(skipped) == len(translation_units):
+            print_warning(
+                f"None of the {len(skipped)} source file(s) are in "
+                "compile_commands.json; only headers will be linted. "
+                "Check that the build directory belongs to this checkout."
+            )
+        elif skipped:
+            print_info(
+                f"Skipping {len(skipped)} source file(s) not in compile_commands.json."
+            )
+        source_files = [f for f in source_files if f not in skipped]
+
     print_info(f"Found {len(source_files)} source files to process.")
 
     # Process files
@@ -317,12 +561,69 @@ def main() -> int:
     else:
         print_info("Running clang-tidy...")
 
-    has_errors = False
+    # Fixes to one file can touch headers shared with another, so apply them serially
+    jobs = 1 if args.fix else max(1, args.jobs)
+
+    # Replay files that passed with identical inputs last time; --fix always
+    # runs, since passing files can still have fixable warnings
+    use_cache = not (args.no_cache or args.fix)
+    cache_file = project_root / LINT_CACHE_FILE
+    cache = {}
+    keys = {}
+    if use_cache:
+        headers = [f for f in source_files if not f.name.endswith(".cpp")]
+        fingerprint = lint_cache_fingerprint(project_root, build_dir, headers)
+        cache = load_cache(cache_file, fingerprint)
+        keys = {
+            file_path: lint_cache_key(
+                file_path, commands.get(compile_db_key(file_path), "")
+            )
+            for file_path in source_files
+        }
+
+    pending = []
     for file_path in source_files:
-        print_info(f"Linting: {file_path}")
-        if not lint_file(file_path, build_dir, args.fix):
-            print_error(f"Linting failed for {file_path}")
-            has_errors = True
+        entry = cache.get(str(file_path))
+        if entry and entry.get("key") == keys[file_path]:
+            print_info(f"Linting: {file_path} (unchanged)")
+            if entry.get("output"):
+                print(entry["output"], end="")
+        else:
+            pending.append(file_path)
+
+    # Fixes are applied one file per process: a compiler error in any file of a
+    # batch would stop clang-tidy from fixing the rest of it
+    if args.no_batch or args.fix:
+        batches = [[file_path] for file_path in pending]
+    else:
+        batches = make_batches(pending, jobs, MAX_BATCH_SIZE)
+
+    has_errors = False
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        # Results come back in submission order, keeping each batch's output together
+        results = executor.map(
+            lambda batch: lint_files(batch, build_dir, args.fix), batches
+        )
+        for batch, (failed, output) in zip(batches, results):
+            for file_path in batch:
+                print_info(f"Linting: {file_path}")
+            if output:
+                print(output)
+            for file_path in failed:
+                print_error(f"Linting failed for {file_path}")
+                has_errors = True
+
+            if use_cache:
+                diagnostics = split_diagnostics(output, batch)
+                for file_path in batch:
+                    if file_path not in failed:
+                        cache[str(file_path)] = {
+                            "key": keys[file_path],
+                            "output": diagnostics[file_path],
+                        }
+
+    if use_cache:
+        save_lint_cache(cache_file, fingerprint, cache)
 
     if not has_errors:
         print_success("All files passed linting successfully.")
@@ -0,0 +1,118 @@
+"""Shared helpers for the clang-format and clang-tidy scripts."""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# File extensions to process
+SOURCE_EXTENSIONS = ("cpp", "h", "hpp", "inl")
+
+# Seconds to wait for a tool version probe before treating the tool as broken
+PROBE_TIMEOUT = 10
+
+
+@functools.lru_cache(maxsize=None)
+def get_tool_version(tool: str) -> Optional[str]:
+    """Get the version string of a tool in PATH, or None if it can't be run"""
+
+    try:
+        result = subprocess.run(
+            [tool, "--version"],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=PROBE_TIMEOUT,
+        )
+        return result.stdout.strip()
+    except (
+        subprocess.CalledProcessError,
+        subprocess.TimeoutExpired,
+        FileNotFoundError,
+    ):
+        return None
+
+
+def get_job_count() -> int:
+    """Return the number of CPUs this process may run on"""
+
+    try:
+        # Honors taskset/cgroup CPU limits, unlike os.cpu_count()
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def make_exclude_prefixes(exclude_dirs: Sequence[Path]) -> Tuple[str, ...]:
+    """Resolve excluded directories once into separator-terminated prefixes"""
+
+    return tuple(os.path.join(str(Path(d).resolve()), "") for d in exclude_dirs)
+
+
+def is_excluded(path: str, exclude_prefixes: Tuple[str, ...]) -> bool:
+    """Check if a path is an excluded directory or lies inside one"""
+
+    return os.path.join(path, "").startswith(exclude_prefixes)
+
+
+def scan_source_dir(
+    source_dir: Path, suffixes: Tuple[str, ...], exclude_prefixes: Tuple[str, ...]
+) -> List[Path]:
+    """Walk one directory for source files, pruning excluded directories"""
+
+    source_files = []
+
+    # Single walk for all extensions; excluded directories are pruned in place
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = [
+            d for d in dirs if not is_excluded(os.path.join(root, d), exclude_prefixes)
+        ]
+        for name in files:
+            if name.endswith(suffixes):
+                source_files.append(Path(root, name))
+
+    return source_files
+
+
+def make_batches(
+    file_paths: List[Path], jobs: int, max_batch_size: int
+) -> List[List[Path]]:
+    """Split files into batches of at most max_batch_size that keep every worker busy"""
+
+    per_job = -(-len(file_paths) // max(1, jobs))
+    size = max(1, min(max_batch_size, per_job))
+    return [file_paths[i : i + size] for i in range(0, len(file_paths), size)]
+
+
+def load_cache(cache_file: Path, fingerprint: str) -> Dict[str, dict]:
+    """Load per-file cache entries, discarding them if the fingerprint changed"""
+
+    try:
+        data = json.loads(cache_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("fingerprint") != fingerprint:
+        return {}
+    files = data.get("files")
+    return files if isinstance(files, dict) else {}
+
+
+def save_cache(cache_file: Path, fingerprint: str, files: Dict[str, dict]) -> None:
+    """
+    Atomically write per-file cache entries back to disk
+
+    Raises:
+        OSError: If the cache file cannot be written
+    """
+
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_suffix(".tmp")
+    tmp_file.write_text(
+        json.dumps({"fingerprint": fingerprint, "files": files}),
+        encoding="utf-8",
+    )
+    os.replace(tmp_file, cache_file)